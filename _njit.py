@@ -0,0 +1,16 @@
+"""Optional numba support: real @njit when numba is installed, no-op otherwise."""
+
+try:
+    from numba import njit, prange
+except ImportError:
+    # Numba is optional; without it the decorated functions run as plain Python.
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+
+        def wrap(func):
+            return func
+
+        return wrap
+
+    prange = range
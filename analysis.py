@@ -1,7 +1,38 @@
+import argparse
+
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import statsmodels.api as sm
+
+def _plot(yearly_stats):
+    """Renders the yearly profit/loss and win-percentage charts to PNG files."""
+    import matplotlib
+    matplotlib.use("Agg")  # headless backend, no display needed
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    # Plot Profit & Loss Per Year
+    plt.figure(figsize=(10, 5))
+    sns.barplot(x="Year", y="Total_Profit", data=yearly_stats, color="green", label="Total Profit")
+    sns.barplot(x="Year", y="Total_Loss", data=yearly_stats, color="red", label="Total Loss")
+    plt.title("Total Profit & Loss by Year")
+    plt.xlabel("Year")
+    plt.ylabel("Profit/Loss")
+    plt.legend()
+    plt.savefig("yearly_profit_loss.png")
+
+    # Plot Win % Per Year
+    plt.figure(figsize=(8, 5))
+    sns.barplot(x="Year", y="Win_Percentage", data=yearly_stats, palette="Blues")
+    plt.title("Winning Percentage by Year")
+    plt.xlabel("Year")
+    plt.ylabel("Win %")
+    plt.ylim(0, 100)
+    plt.savefig("yearly_win_percentage.png")
+
+    print("Saved charts to 'yearly_profit_loss.png' and 'yearly_win_percentage.png'.")
+
+parser = argparse.ArgumentParser(description="Summarizes backtest results by year.")
+parser.add_argument("--plot", action="store_true", help="Also render the yearly charts as PNG files")
+args = parser.parse_args()
 
 # Load CSV File
 file_path = "detailed_backtest_results.csv"  # Update the path if needed
@@ -11,33 +42,24 @@ df = pd.read_csv(file_path)
 df["Entry Date"] = pd.to_datetime(df["Entry Date"])
 df["Year"] = df["Entry Date"].dt.year
 
+# Split wins/losses up front so the groupby only runs C-level sums/means
+df["Win"] = df["Profit/Loss"] > 0
+df["Profit"] = df["Profit/Loss"].where(df["Win"], 0)
+df["Loss"] = df["Profit/Loss"].where(~df["Win"], 0)
+
 # Group data by Year
 yearly_stats = df.groupby("Year").agg(
-    Total_Profit=("Profit/Loss", lambda x: x[x > 0].sum()),
-    Total_Loss=("Profit/Loss", lambda x: x[x < 0].sum()),
-    Win_Percentage=("Profit/Loss", lambda x: (x > 0).mean() * 100),
+    Total_Profit=("Profit", "sum"),
+    Total_Loss=("Loss", "sum"),
+    Win_Percentage=("Win", "mean"),
     Total_Trades=("Profit/Loss", "count"),
 ).reset_index()
-
-# Plot Profit & Loss Per Year
-plt.figure(figsize=(10, 5))
-sns.barplot(x="Year", y="Total_Profit", data=yearly_stats, color="green", label="Total Profit")
-sns.barplot(x="Year", y="Total_Loss", data=yearly_stats, color="red", label="Total Loss")
-plt.title("Total Profit & Loss by Year")
-plt.xlabel("Year")
-plt.ylabel("Profit/Loss")
-plt.legend()
-plt.show()
-
-# Plot Win % Per Year
-plt.figure(figsize=(8, 5))
-sns.barplot(x="Year", y="Win_Percentage", data=yearly_stats, palette="Blues")
-plt.title("Winning Percentage by Year")
-plt.xlabel("Year")
-plt.ylabel("Win %")
-plt.ylim(0, 100)
-plt.show()
+yearly_stats["Win_Percentage"] *= 100
 
 # Save Yearly Performance Data
 yearly_stats.to_csv("yearly_performance.csv", index=False)
 print("\n✅ Analysis Completed! Yearly performance saved in 'yearly_performance.csv'.")
+
+# Render charts only when asked; the CSV is the output downstream tools use
+if args.plot:
+    _plot(yearly_stats)
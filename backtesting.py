@@ -1,7 +1,10 @@
+import io
+
 import pandas as pd
+import numpy as np
 import psycopg2
 import yaml
-import concurrent.futures
+from _njit import njit, prange
 
 # Load database config
 with open("config.yaml", "r") as file:
@@ -29,20 +32,36 @@ def fetch_all_stock_data():
     if not conn:
         return None
     
-    query = "SELECT stock_symbol, date, close_price FROM stock_data ORDER BY stock_symbol, date;"
-    
+    query = "COPY (SELECT stock_symbol, date, close_price FROM stock_data ORDER BY stock_symbol, date) TO STDOUT WITH CSV HEADER"
+
     try:
-        df = pd.read_sql(query, conn)
+        buf = io.BytesIO()
+        with conn.cursor() as cursor:
+            cursor.copy_expert(query, buf)
         conn.close()
+        buf.seek(0)
+        df = pd.read_csv(buf, parse_dates=["date"])
     except Exception as e:
         print(f"Error fetching stock data: {e}")
         return None
-    
-    df["date"] = pd.to_datetime(df["date"])
-    df.set_index(["stock_symbol", "date"], inplace=True)
-    
-    stock_data_dict = {symbol: df.xs(symbol, level="stock_symbol") for symbol in df.index.get_level_values("stock_symbol").unique()}
-    
+
+    # Categorical symbols group on integer codes instead of hashing Python
+    # strings, and shrink the column to one code per row.
+    df["stock_symbol"] = df["stock_symbol"].astype("category")
+
+    # Rows arrive sorted by (stock_symbol, date), so a single groupby pass
+    # yields each symbol's slice without per-symbol index searches. Each
+    # symbol is kept as a pair of flat arrays (dates, close prices): the
+    # backtest only ever touches close_price, and contiguous float64 arrays
+    # are cache-friendly and feed straight into the numba kernel.
+    stock_data_dict = {
+        symbol: (
+            group["date"].to_numpy(dtype="datetime64[ns]"),
+            np.ascontiguousarray(group["close_price"].to_numpy(), dtype=np.float64),
+        )
+        for symbol, group in df.groupby("stock_symbol", sort=False, observed=True)
+    }
+
     print("Stock data loaded successfully.")
     return stock_data_dict
 
@@ -54,87 +73,54 @@ def fetch_high_volume_weeks():
         return None
     
     query = """
-    SELECT stock_symbol, week_end_date, volume_multiple, rsi_value, weekly_volume
-    FROM high_volume_weeks;
+    COPY (
+        SELECT stock_symbol, week_end_date, volume_multiple, rsi_value, weekly_volume
+        FROM high_volume_weeks
+    ) TO STDOUT WITH CSV HEADER
     """
-    
+
     try:
-        df = pd.read_sql(query, conn)
+        buf = io.BytesIO()
+        with conn.cursor() as cursor:
+            cursor.copy_expert(query, buf)
         conn.close()
+        buf.seek(0)
+        df = pd.read_csv(buf, parse_dates=["week_end_date"])
     except Exception as e:
         print(f"Error fetching high volume weeks: {e}")
         return None
-    
-    df["week_end_date"] = pd.to_datetime(df["week_end_date"])
-    return df
 
-# Find the closest previous Friday's closing price
-def get_valid_entry_date(df_stock, week_end_date):
-    """Finds the closest trading day before Sunday (preferably Friday)."""
-    possible_days = [week_end_date - pd.Timedelta(days=i) for i in range(3)]
-    for date in possible_days:
-        if date in df_stock.index:
-            return date, df_stock.loc[date, "close_price"]
-    return None, None
-
-# Process each stock in parallel
-def process_stock(row, stock_data_dict):
-    """Processes a single stock for backtesting."""
-    stock = row["stock_symbol"]
-    week_end_date = row["week_end_date"]
-    volume_multiple = row["volume_multiple"]
-    rsi_value = row["rsi_value"]
-    weekly_volume = row["weekly_volume"]
-
-    df_stock = stock_data_dict.get(stock)
-    if df_stock is None:
-        return None
-    
-    entry_date, entry_price = get_valid_entry_date(df_stock, week_end_date)
-    if entry_date is None:
-        return None
-    
-    # Define targets and stop-loss
-    target1 = entry_price * 1.15# 10%
-    target2 = entry_price * 1.25# 15%
-    target3 = entry_price * 1.35  # 20%
-    stop_loss = entry_price * 0.7 # 15% stop loss
-
-    # Start scanning for exits
-    future_data = df_stock[df_stock.index > entry_date]
-    exit_date, exit_price = None, None
-
-    for date, row in future_data.iterrows():
-        price = row["close_price"]
+    return df
 
-        # Update trailing stop-loss
+# Trailing-stop scan compiled with numba when available
+@njit(cache=True)
+def _scan_exit(prices, entry_price):
+    """Scans a close-price array for the trailing-stop exit; returns the bar index or -1."""
+    target1 = entry_price * 1.15
+    target2 = entry_price * 1.25
+    target3 = entry_price * 1.35
+    stop_loss = entry_price * 0.7
+
+    for i in range(len(prices)):
+        price = prices[i]
         if price >= target1:
-            stop_loss = entry_price*1.01                     
+            stop_loss = entry_price * 1.01
         if price >= target2:
-            stop_loss = target1  # Move SL to Target 1
+            stop_loss = target1
         if price >= target3:
-            stop_loss = target2  # Move SL to Target 2
-
+            stop_loss = target2
         if price <= stop_loss or price >= target3:
-            exit_date, exit_price = date, price
-            break
-
-    if exit_date is None:
-        return None
+            return i
+    return -1
 
-    # Calculate profit/loss
-    profit_loss = exit_price - entry_price
-    profit_loss_pct = ((exit_price / entry_price) - 1) * 100
-    profit_or_loss = "Profit" if profit_loss > 0 else "Loss"
-    days_in_trade = (exit_date - entry_date).days
+# Run the exit scan for every trade in one parallel kernel
+@njit(parallel=True, cache=True)
+def _scan_exits_batch(all_prices, starts, ends, entry_prices, out):
+    """Scans each [start, end) slice of the concatenated price array in parallel."""
+    for i in prange(len(starts)):
+        out[i] = _scan_exit(all_prices[starts[i]:ends[i]], entry_prices[i])
 
-    return [
-        stock, entry_date, entry_price, exit_date, exit_price, 
-        profit_loss, profit_loss_pct, profit_or_loss, days_in_trade,
-        volume_multiple, rsi_value, weekly_volume
-    ]
-
-# Run backtest with multithreading
+# Run backtest with a single fused kernel over all trades
 def run_backtest():
     print("Starting backtest process...")
 
@@ -146,15 +132,71 @@ def run_backtest():
     if high_vol_weeks is None:
         return
 
-    results = []
+    # Flatten every symbol into one concatenated price/date array with offsets
+    symbols = list(stock_data_dict)
+    offsets = {}
+    total = 0
+    for symbol in symbols:
+        offsets[symbol] = total
+        total += len(stock_data_dict[symbol][1])
+    all_dates = np.concatenate([stock_data_dict[s][0] for s in symbols]) if symbols else np.empty(0, dtype="datetime64[ns]")
+    all_prices = np.concatenate([stock_data_dict[s][1] for s in symbols]) if symbols else np.empty(0)
+
+    # Resolve all entries per symbol with one vectorized backward search over
+    # that symbol's dates (closest trading day at most two days before the
+    # week-end stamp, i.e. Friday for a Sunday stamp), then build the
+    # per-trade scan bounds
+    trades = []
+    starts, ends, entry_prices = [], [], []
+    for symbol, group in high_vol_weeks.groupby("stock_symbol", sort=False):
+        arrays = stock_data_dict.get(symbol)
+        if arrays is None:
+            continue
+
+        dates, prices = arrays
+        base = offsets[symbol]
+        targets = group["week_end_date"].to_numpy(dtype="datetime64[ns]")
+        pos = np.searchsorted(dates, targets, side="right") - 1
+        pos_clip = np.maximum(pos, 0)
+        valid = (pos >= 0) & ((targets - dates[pos_clip]) <= np.timedelta64(2, "D"))
+
+        for row, p, ok in zip(group.itertuples(index=False), pos_clip, valid):
+            if not ok:
+                continue
+            starts.append(base + p + 1)  # scan begins on the bar after entry
+            ends.append(base + len(prices))
+            entry_prices.append(float(prices[p]))
+            trades.append((symbol, dates[p], prices[p],
+                           row.volume_multiple, row.rsi_value, row.weekly_volume))
+
+    # One kernel call scans every trade; numba parallelizes across cores
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    entry_price_arr = np.asarray(entry_prices, dtype=np.float64)
+    exit_offsets = np.empty(len(trades), dtype=np.int64)
+    if trades:
+        _scan_exits_batch(all_prices, starts, ends, entry_price_arr, exit_offsets)
 
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        futures = {executor.submit(process_stock, row, stock_data_dict): row for _, row in high_vol_weeks.iterrows()}
-        
-        for future in concurrent.futures.as_completed(futures):
-            result = future.result()
-            if result:
-                results.append(result)
+    results = []
+    for i, (stock, entry_date, entry_price, volume_multiple, rsi_value, weekly_volume) in enumerate(trades):
+        if exit_offsets[i] < 0:
+            continue
+
+        pos = starts[i] + exit_offsets[i]
+        entry_date = pd.Timestamp(entry_date)
+        exit_date = pd.Timestamp(all_dates[pos])
+        exit_price = all_prices[pos]
+
+        profit_loss = exit_price - entry_price
+        profit_loss_pct = ((exit_price / entry_price) - 1) * 100
+        profit_or_loss = "Profit" if profit_loss > 0 else "Loss"
+        days_in_trade = (exit_date - entry_date).days
+
+        results.append([
+            stock, entry_date, entry_price, exit_date, exit_price,
+            profit_loss, profit_loss_pct, profit_or_loss, days_in_trade,
+            volume_multiple, rsi_value, weekly_volume
+        ])
 
     df_results = pd.DataFrame(results, columns=[
         "Stock Symbol", "Entry Date", "Entry Price", "Exit Date", "Exit Price", 
@@ -196,4 +238,5 @@ def generate_backtest_summary(df):
     pd.DataFrame([summary]).to_csv("backtest_summary.csv", index=False)
     print(summary)
 
-run_backtest()
+if __name__ == "__main__":
+    run_backtest()
@@ -1,7 +1,57 @@
+import threading
+
 import pandas as pd
+import numpy as np
 import psycopg2
 import yaml
-import ta
+from psycopg2.extras import execute_values
+from concurrent.futures import ThreadPoolExecutor
+from _njit import njit
+
+@njit(cache=True)
+def _ema(values, window):
+    """Exponential moving average (2/(window+1) smoothing), seeded at the first finite value."""
+    alpha = 2.0 / (window + 1.0)
+    n = len(values)
+    out = np.full(n, np.nan)
+    i = 0
+    while i < n and np.isnan(values[i]):
+        i += 1
+    if i == n:
+        return out
+    out[i] = values[i]
+    for j in range(i + 1, n):
+        out[j] = alpha * values[j] + (1.0 - alpha) * out[j - 1]
+    return out
+
+@njit(cache=True)
+def _rsi(values, window):
+    """Wilder's RSI over a close-price array; NaN during the warm-up window."""
+    n = len(values)
+    out = np.full(n, np.nan)
+    if n <= window:
+        return out
+
+    gain_sum = 0.0
+    loss_sum = 0.0
+    for i in range(1, window + 1):
+        delta = values[i] - values[i - 1]
+        if delta > 0:
+            gain_sum += delta
+        else:
+            loss_sum -= delta
+    avg_gain = gain_sum / window
+    avg_loss = loss_sum / window
+    out[window] = 100.0 if avg_loss == 0 else 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+    for i in range(window + 1, n):
+        delta = values[i] - values[i - 1]
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+        avg_gain = (avg_gain * (window - 1) + gain) / window
+        avg_loss = (avg_loss * (window - 1) + loss) / window
+        out[i] = 100.0 if avg_loss == 0 else 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    return out
 
 class KnoxvilleDivergenceAnalyzer:
     """Analyzes Knoxville Divergence and stores bullish signals in the database."""
@@ -18,7 +68,14 @@ class KnoxvilleDivergenceAnalyzer:
             host=self.db_config["host"],
             port=self.db_config["port"]
         )
-        self.conn.autocommit = True
+        # Writes batch into one explicit transaction instead of paying a
+        # WAL-fsyncing COMMIT per statement
+        self.conn.autocommit = False
+        # psycopg2 connections must not be shared across threads, so each
+        # fetch thread gets its own connection, tracked here for cleanup
+        self._local = threading.local()
+        self._thread_conns = []
+        self._conn_lock = threading.Lock()
         self.create_table()
         self.clear_table()
     
@@ -33,49 +90,92 @@ class KnoxvilleDivergenceAnalyzer:
         """
         with self.conn.cursor() as cursor:
             cursor.execute(query)
-    
+        self.conn.commit()
+
     def clear_table(self):
         query = "DELETE FROM bullish_knoxville_divergence;"
         with self.conn.cursor() as cursor:
             cursor.execute(query)
+        self.conn.commit()
     
+    def _thread_conn(self):
+        """Returns this thread's connection, opening and preparing it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = psycopg2.connect(
+                dbname=self.db_config["dbname"],
+                user=self.db_config["user"],
+                password=self.db_config["password"],
+                host=self.db_config["host"],
+                port=self.db_config["port"]
+            )
+            conn.autocommit = True  # read-only, no transaction to hold open
+            # Prepare the per-symbol fetch once so Postgres caches the plan
+            # across this connection's loop iterations
+            query = """
+            PREPARE fetch_stock_data AS
+            SELECT date, close_price FROM stock_data WHERE stock_symbol = $1 ORDER BY date ASC;
+            """
+            with conn.cursor() as cursor:
+                cursor.execute(query)
+            self._local.conn = conn
+            with self._conn_lock:
+                self._thread_conns.append(conn)
+        return conn
+
     def fetch_stock_data(self, symbol):
-        query = f"SELECT date, close_price FROM stock_data WHERE stock_symbol = '{symbol}' ORDER BY date ASC;"
-        with self.conn.cursor() as cursor:
-            cursor.execute(query)
+        with self._thread_conn().cursor() as cursor:
+            cursor.execute("EXECUTE fetch_stock_data(%s);", (symbol,))
             rows = cursor.fetchall()
             columns = [desc[0] for desc in cursor.description]
         return pd.DataFrame(rows, columns=columns)
     
     def knoxville_divergence(self, df, rsi_period=14, ema_period=200):
-        df['RSI'] = ta.momentum.RSIIndicator(df['close_price'], window=rsi_period).rsi()
-        df['EMA'] = ta.trend.EMAIndicator(df['close_price'], window=ema_period).ema_indicator()
-        df['RSI_EMA'] = ta.trend.EMAIndicator(df['RSI'], window=ema_period).ema_indicator()
-        df['Momentum'] = df['RSI'] - df['RSI_EMA']
-        df['Bullish_Divergence'] = (df['Momentum'] > 0) & (df['Momentum'].shift(1) < 0)
-        return df[df['Bullish_Divergence']][['date', 'close_price']]
+        close = np.ascontiguousarray(df['close_price'].to_numpy(), dtype=np.float64)
+        rsi = _rsi(close, rsi_period)
+        momentum = rsi - _ema(rsi, ema_period)
+
+        # Bullish divergence = momentum crossing up through zero
+        prev_momentum = np.empty_like(momentum)
+        prev_momentum[0] = np.nan
+        prev_momentum[1:] = momentum[:-1]
+        bullish = (momentum > 0) & (prev_momentum < 0)
+        return df.loc[bullish, ['date', 'close_price']]
     
     def save_bullish_divergence(self, symbol, df):
         query = """
         INSERT INTO bullish_knoxville_divergence (stock_symbol, date, close_price)
-        VALUES (%s, %s, %s) 
+        VALUES %s
         ON CONFLICT DO NOTHING;
         """
+        rows = [(symbol, row.date, row.close_price) for row in df.itertuples(index=False)]
         with self.conn.cursor() as cursor:
-            for _, row in df.iterrows():
-                cursor.execute(query, (symbol, row['date'], row['close_price']))
+            execute_values(cursor, query, rows, page_size=1000)
     
+    def _process_one_symbol(self, symbol):
+        """Fetches one symbol on this thread's connection and computes its divergence."""
+        df = self.fetch_stock_data(symbol)
+        if df.empty:
+            return symbol, None
+        return symbol, self.knoxville_divergence(df)
+
     def analyze_and_store(self):
         stock_list = pd.read_csv('knoxville_stock_list.csv')
         results = []
-        for symbol in stock_list['Symbol']:
-            df = self.fetch_stock_data(symbol)
-            if not df.empty:
-                bullish_divergence = self.knoxville_divergence(df)
-                if not bullish_divergence.empty:
-                    self.save_bullish_divergence(symbol, bullish_divergence)
-                    bullish_divergence['stock_symbol'] = symbol
-                    results.append(bullish_divergence)
+        # The per-symbol SELECTs are I/O-bound and psycopg2 releases the GIL
+        # while waiting on the network, so fan the fetches out over threads;
+        # writes stay serialized on the main connection and commit once.
+        try:
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                for symbol, bullish_divergence in executor.map(self._process_one_symbol, stock_list['Symbol']):
+                    if bullish_divergence is not None and not bullish_divergence.empty:
+                        self.save_bullish_divergence(symbol, bullish_divergence)
+                        bullish_divergence['stock_symbol'] = symbol
+                        results.append(bullish_divergence)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
         
         if results:
             final_df = pd.concat(results)
@@ -83,6 +183,10 @@ class KnoxvilleDivergenceAnalyzer:
             print("Exported results to bullish_knoxville_divergence.csv")
     
     def close_connection(self):
+        with self._conn_lock:
+            for conn in self._thread_conns:
+                conn.close()
+            self._thread_conns = []
         self.conn.close()
     
 if __name__ == "__main__":
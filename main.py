@@ -1,9 +1,9 @@
+import io
+
 import pandas as pd
 import yfinance as yf
 import psycopg2
 import yaml
-from psycopg2.extras import execute_values
-from concurrent.futures import ThreadPoolExecutor
 
 # Load configuration from YAML file
 with open("config.yaml", "r") as file:
@@ -44,20 +44,27 @@ class DatabaseManager:
         print("Deleted all existing stock data.")
 
     def insert_data(self, df):
-        """Inserts stock data into PostgreSQL."""
+        """Inserts stock data into PostgreSQL via COPY."""
         if df is None or df.empty:
             return
-        
-        query = """
-        INSERT INTO stock_data (date, stock_symbol, open_price, high_price, low_price, close_price, volume)
-        VALUES %s ON CONFLICT (stock_symbol, date) DO NOTHING;
-        """
-        
-        data_tuples = list(df.itertuples(index=False, name=None))
+
+        buf = io.StringIO()
+        df.to_csv(buf, index=False, header=False,
+                  columns=["Date", "Symbol", "Open", "High", "Low", "Close", "Volume"])
+        buf.seek(0)
+
+        # COPY into a staging table first so duplicate (symbol, date) rows
+        # still resolve through ON CONFLICT DO NOTHING.
         with self.conn.cursor() as cursor:
-            execute_values(cursor, query, data_tuples)
+            cursor.execute("CREATE TEMP TABLE stock_data_stage (LIKE stock_data);")
+            cursor.copy_expert(
+                "COPY stock_data_stage (date, stock_symbol, open_price, high_price, low_price, close_price, volume) FROM STDIN WITH CSV",
+                buf
+            )
+            cursor.execute("INSERT INTO stock_data SELECT * FROM stock_data_stage ON CONFLICT (stock_symbol, date) DO NOTHING;")
+            cursor.execute("DROP TABLE stock_data_stage;")
             self.conn.commit()
-        
+
         print(f"Inserted {len(df)} records for {df['Symbol'][0]}.")
 
     def close_connection(self):
@@ -71,24 +78,37 @@ class StockFetcher:
     def __init__(self):
         self.period = config["fetch_settings"]["period"]
 
-    def fetch_data(self, symbol):
-        """Fetches stock data for a given symbol."""
+    def fetch_all(self, symbols):
+        """Fetches all symbols in one batched multi-ticker download."""
+        tickers = [symbol + ".NS" for symbol in symbols]
         try:
-            stock = yf.Ticker(symbol+".NS")
-            df = stock.history(period=self.period)
-            
+            df_all = yf.download(tickers, period=self.period, group_by="ticker",
+                                 threads=True, auto_adjust=False, progress=False)
+        except Exception as e:
+            print(f"Error fetching data: {e}")
+            return {}
+
+        frames = {}
+        downloaded = set(df_all.columns.get_level_values(0))
+        for symbol, ticker in zip(symbols, tickers):
+            if ticker not in downloaded:
+                print(f"No data found for {symbol}. Skipping...")
+                continue
+
+            df = df_all[ticker].dropna(how="all")
             if df.empty:
                 print(f"No data found for {symbol}. Skipping...")
-                return None
-            
-            df.reset_index(inplace=True)
+                continue
+
+            df = df.reset_index()
             df["Symbol"] = symbol  # Add stock symbol column
-            
-            return df[["Date", "Symbol", "Open", "High", "Low", "Close", "Volume"]]
-        
-        except Exception as e:
-            print(f"Error fetching data for {symbol}: {e}")
-            return None
+            # The union date index across tickers NaN-pads Volume to float64;
+            # COPY into the BIGINT column rejects "123.0", so cast back to
+            # integers (nullable Int64 turns any NaN into an empty/NULL field)
+            df["Volume"] = df["Volume"].round().astype("Int64")
+            frames[symbol] = df[["Date", "Symbol", "Open", "High", "Low", "Close", "Volume"]]
+
+        return frames
 
 
 
@@ -107,16 +127,11 @@ class StockDataPipeline:
         df = pd.read_csv(csv_file)
         return df["Symbol"].tolist()
 
-    def fetch_and_store(self, symbol):
-        """Fetch and store data for a single stock."""
-        print(f"Fetching data for {symbol}...")
-        stock_df = self.fetcher.fetch_data(symbol)
-        self.db_manager.insert_data(stock_df)
-
     def run(self):
-        """Runs the full pipeline with multithreading."""
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            executor.map(self.fetch_and_store, self.stock_symbols)
+        """Runs the full pipeline with one batched download."""
+        print(f"Fetching data for {len(self.stock_symbols)} symbols...")
+        for stock_df in self.fetcher.fetch_all(self.stock_symbols).values():
+            self.db_manager.insert_data(stock_df)
 
         self.db_manager.close_connection()
         print("Data fetching and storing complete.")
@@ -1,3 +1,5 @@
+import io
+
 import psycopg2
 import pandas as pd
 import yaml
@@ -30,21 +32,23 @@ class WeeklyVolumeAnalyzer:
     def fetch_data(self):
         """Fetches stock data including volume, open, close, high, and low prices."""
         query = """
-        SELECT stock_symbol, date, volume, open_price, close_price, high_price, low_price
-        FROM stock_data 
-        ORDER BY stock_symbol, date;
+        COPY (
+            SELECT stock_symbol, date, volume, open_price, close_price, high_price, low_price
+            FROM stock_data
+            ORDER BY stock_symbol, date
+        ) TO STDOUT WITH CSV HEADER
         """
+        buf = io.BytesIO()
         with self.conn.cursor() as cursor:
-            cursor.execute(query)
-            rows = cursor.fetchall()
-            columns = [desc[0] for desc in cursor.description]
-        return pd.DataFrame(rows, columns=columns)
+            cursor.copy_expert(query, buf)
+        buf.seek(0)
+        return pd.read_csv(buf)
 
     def calculate_rsi(self, prices, window=14):
-        """Computes RSI for a given price series."""
+        """Computes Wilder's RSI for a given price series."""
         delta = prices.diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=window).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=window).mean()
+        gain = delta.clip(lower=0).ewm(alpha=1 / window, adjust=False, min_periods=window).mean()
+        loss = (-delta.clip(upper=0)).ewm(alpha=1 / window, adjust=False, min_periods=window).mean()
         rs = gain / loss
         rsi = 100 - (100 / (1 + rs))
         return rsi
@@ -57,66 +61,64 @@ class WeeklyVolumeAnalyzer:
             return
 
         df["date"] = pd.to_datetime(df["date"])
+        # Categorical symbols group on integer codes instead of hashing
+        # Python strings for every row.
+        df["stock_symbol"] = df["stock_symbol"].astype("category")
         df.set_index("date", inplace=True)
 
-        results = []
-        for symbol, group in df.groupby("stock_symbol"):
-            # Resample weekly, summing volume and checking for green candles
-            weekly_df = group.resample("W").agg({
-                "volume": "sum",
-                "open_price": "first",  # First day's open
-                "close_price": "last",  # Last day's close
-                "high_price": "max",
-                "low_price": "min"
-            }).reset_index()
-            
-            weekly_df["week_start"] = weekly_df["date"] - pd.Timedelta(days=6)
-
-            # Marubozu Condition: Open = Low, Close = High
-            # Allow a small wick: Open should be near Low, Close should be near High
-            weekly_df["is_marubozu"] = (
-                (weekly_df["open_price"] <= weekly_df["low_price"] * 1.03)& # Open close to Low (0.2% tolerance)
-                (weekly_df["close_price"] >= weekly_df["high_price"] * 0.97) # Close close to High (0.2% tolerance)
-            )
-
-
-            # Calculate rolling 6-week average volume
-            rolling_avg = weekly_df["volume"].rolling(window=6).mean().shift(1)
-            volume_multiple = weekly_df["volume"] / rolling_avg
-
-            # Compute RSI
-            weekly_df["rsi"] = self.calculate_rsi(weekly_df["close_price"])
-            # Ensure previous week was green (Close > Open) & Volume < 50% of current week
-            weekly_df["prev_close"] = weekly_df["close_price"].shift(1)
-            weekly_df["prev_open"] = weekly_df["open_price"].shift(1)
-            weekly_df["prev_volume"] = weekly_df["volume"].shift(1)
-
-            weekly_df["prev_week_green"] = weekly_df["prev_close"] > weekly_df["prev_open"]
-            weekly_df["prev_week_low_volume"] = weekly_df["prev_volume"] < (weekly_df["volume"] * 0.5)
-
-            # Filter for valid high-volume weeks (Volume Multiple 4-15, Marubozu, RSI 50-70)
-            high_vol_weeks = weekly_df[
-                (volume_multiple >= 3) &
-                (weekly_df["volume"] >500000) &
-                (volume_multiple <= 15) &
-                (weekly_df["is_marubozu"]) & 
-                (weekly_df["rsi"] >= 40) & 
-                (weekly_df["rsi"] <= 95)&
-                (weekly_df["prev_week_green"]) &  # Previous week must be green
-                (weekly_df["prev_week_low_volume"])  # Previous volume must be < 50% of current week
-            ].copy()
-
-            high_vol_weeks["volume_multiple"] = volume_multiple[high_vol_weeks.index]
-
-            for _, row in high_vol_weeks.iterrows():
-                results.append((
-                    symbol,
-                    row["week_start"].date(),
-                    row["date"].date(),
-                    row["volume"],
-                    row["volume_multiple"],
-                    row["rsi"]
-                ))
+        # Resample weekly per symbol in a single groupby pass, summing volume
+        weekly_df = df.groupby("stock_symbol", observed=True).resample("W").agg({
+            "volume": "sum",
+            "open_price": "first",  # First day's open
+            "close_price": "last",  # Last day's close
+            "high_price": "max",
+            "low_price": "min"
+        }).reset_index()
+
+        weekly_df["week_start"] = weekly_df["date"] - pd.Timedelta(days=6)
+
+        # Marubozu Condition: Open = Low, Close = High
+        # Allow a small wick: Open should be near Low, Close should be near High
+        weekly_df["is_marubozu"] = (
+            (weekly_df["open_price"] <= weekly_df["low_price"] * 1.03)& # Open close to Low (0.2% tolerance)
+            (weekly_df["close_price"] >= weekly_df["high_price"] * 0.97) # Close close to High (0.2% tolerance)
+        )
+
+        grouped = weekly_df.groupby("stock_symbol", sort=False, observed=True)
+
+        # Calculate rolling 6-week average volume within each symbol
+        rolling_avg = grouped["volume"].transform(lambda v: v.rolling(window=6).mean().shift(1))
+        volume_multiple = weekly_df["volume"] / rolling_avg
+
+        # Compute RSI per symbol
+        weekly_df["rsi"] = grouped["close_price"].transform(self.calculate_rsi)
+        # Ensure previous week was green (Close > Open) & Volume < 50% of current week
+        weekly_df["prev_close"] = grouped["close_price"].shift(1)
+        weekly_df["prev_open"] = grouped["open_price"].shift(1)
+        weekly_df["prev_volume"] = grouped["volume"].shift(1)
+
+        weekly_df["prev_week_green"] = weekly_df["prev_close"] > weekly_df["prev_open"]
+        weekly_df["prev_week_low_volume"] = weekly_df["prev_volume"] < (weekly_df["volume"] * 0.5)
+
+        # Filter for valid high-volume weeks (Volume Multiple 4-15, Marubozu, RSI 50-70)
+        high_vol_weeks = weekly_df[
+            (volume_multiple >= 3) &
+            (weekly_df["volume"] >500000) &
+            (volume_multiple <= 15) &
+            (weekly_df["is_marubozu"]) &
+            (weekly_df["rsi"] >= 40) &
+            (weekly_df["rsi"] <= 95)&
+            (weekly_df["prev_week_green"]) &  # Previous week must be green
+            (weekly_df["prev_week_low_volume"])  # Previous volume must be < 50% of current week
+        ].copy()
+
+        high_vol_weeks["volume_multiple"] = volume_multiple[high_vol_weeks.index]
+        high_vol_weeks["week_start"] = high_vol_weeks["week_start"].dt.date
+        high_vol_weeks["week_end"] = high_vol_weeks["date"].dt.date
+
+        results = list(high_vol_weeks[
+            ["stock_symbol", "week_start", "week_end", "volume", "volume_multiple", "rsi"]
+        ].itertuples(index=False, name=None))
 
         if results:
             self.store_results(results)
@@ -144,11 +146,12 @@ class WeeklyVolumeAnalyzer:
 
     def export_to_csv(self):
         """Exports the high_volume_weeks table to a CSV file."""
-        query = "SELECT * FROM high_volume_weeks ORDER BY stock_symbol, week_start_date;"
-        df = pd.read_sql(query, self.conn)
+        query = "COPY (SELECT * FROM high_volume_weeks ORDER BY stock_symbol, week_start_date) TO STDOUT WITH CSV HEADER"
 
         file_path = "high_volume_weeks.csv"
-        df.to_csv(file_path, index=False)
+        with open(file_path, "w") as f:
+            with self.conn.cursor() as cursor:
+                cursor.copy_expert(query, f)
         print(f"Exported high-volume weeks to {file_path}")
 
     def close_connection(self):